@@ -3,7 +3,10 @@
 
 Endpoints:
 - GET /       -> simple HTML UI
-- POST /api/captions -> { url: string, lang?: 'es', sleep_subtitles?: int }
+- POST /api/captions -> { url: string, lang?: 'es' | ['es', 'en'], sleep_subtitles?: int }
+    returns the captions directly when cached, otherwise 202 { job_id }
+- GET /progress/<job_id> -> text/event-stream with yt-dlp progress; the last
+    event has status "done" and carries the result and its HTTP status code
 
 The server listens on host 0.0.0.0 and port defined by the PORT env var (default 5000).
 
@@ -12,114 +15,404 @@ Notes about YouTube subtitles and 429 issues (see https://github.com/yt-dlp/yt-d
 - If you hit HTTP 429: options include passing fresh cookies or increasing sleep_subtitles (e.g. 60s).
 """
 import os
+import hashlib
+import re
+import time
+import random
 import tempfile
-import shutil
-import json
-from glob import glob
-from flask import Flask, request, jsonify, send_from_directory, render_template
+import threading
+import queue
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import orjson
+from cachetools import TTLCache
+from flask import Flask, Response, request, send_from_directory
 from yt_dlp import YoutubeDL
 
 # reuse helpers from download_subs
-from download_subs import extract_plain_from_vtt, extract_plain_from_srt
+from download_subs import (
+    extract_plain_from_json3,
+    extract_plain_from_srt,
+    extract_plain_from_vtt,
+)
 
 app = Flask(__name__, static_folder="static", template_folder="templates")
 
+# the page has no template variables: read it once and serve it with an ETag
+with open(os.path.join(app.root_path, app.template_folder, "index.html"), "rb") as fh:
+    INDEX_BYTES = fh.read()
+INDEX_ETAG = hashlib.md5(INDEX_BYTES).hexdigest()
+
+SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# plain-text captions keyed by (video id, lang); repeat hits skip yt-dlp entirely
+CAPTIONS_CACHE = TTLCache(maxsize=1024, ttl=3600)
+CAPTIONS_CACHE_LOCK = threading.Lock()
+
+VIDEO_ID_RE = re.compile(
+    r"(?:youtu\.be/|[?&]v=|/(?:shorts|embed|live|v)/)([A-Za-z0-9_-]{11})"
+)
+
+
+# background caption jobs: job id -> queue of progress events for /progress.
+# Entries expire even if no client ever reads (or finishes reading) the stream.
+JOBS = TTLCache(maxsize=1024, ttl=int(os.environ.get("JOB_TTL", 900)))
+JOBS_LOCK = threading.Lock()
+
+
+YDL_OPTS = {
+    "writesubtitles": True,
+    "writeautomaticsub": True,
+    "skip_download": True,
+    "quiet": True,
+    "no_warnings": True,
+    # avoid auto-translated subs where possible
+    "extractor_args": {"youtube": "skip=translated_subs"},
+    # prefer YouTube's json3 (plain text segments, no tag stripping); otherwise
+    # take what yt-dlp considers best (vtt on YouTube)
+    "subtitlesformat": "json3/best",
+}
+
+# subtitle extensions we can extract text from, in order of preference
+SUB_EXTS = ("json3", "srt", "vtt")
+PLAIN_EXTRACTORS = {
+    "json3": extract_plain_from_json3,
+    "srt": extract_plain_from_srt,
+    "vtt": extract_plain_from_vtt,
+}
+
+# parallel subtitle downloads when several languages are requested
+LANG_WORKERS = 8
+
+# idle YoutubeDL instances; building one loads every extractor, so reuse them.
+# An instance is only ever used by one thread at a time.
+YDL_POOL = queue.Queue(maxsize=int(os.environ.get("YDL_POOL_SIZE", 4)))
+# per-thread progress callback for the hook shared by all pooled instances
+YDL_LOCAL = threading.local()
+
+
+def ydl_progress_hook(d):
+    progress = getattr(YDL_LOCAL, "progress", None)
+    if progress:
+        progress(progress_event(d))
+
+
+@contextmanager
+def pooled_ydl(**params):
+    """Borrow a YoutubeDL from the pool with the per-request `params` applied."""
+    try:
+        ydl = YDL_POOL.get_nowait()
+    except queue.Empty:
+        ydl = YoutubeDL(dict(YDL_OPTS, progress_hooks=[ydl_progress_hook]))
+    ydl.params.update(params)
+    try:
+        yield ydl
+    finally:
+        try:
+            YDL_POOL.put_nowait(ydl)
+        except queue.Full:
+            ydl.close()
+
+
+# yt-dlp attempts per request when YouTube answers 429 Too Many Requests
+RETRY_ATTEMPTS = 3
+NOTE_429 = "Warning: YouTube returned 429. Try passing fresh cookies or increasing sleep_subtitles (e.g. 60)."
+RETRY_AFTER_RE = re.compile(r"Retry-After:\s*(\d+)", re.I)
+
+
+def retry_delay(attempt, msg):
+    """Seconds to wait before retrying: Retry-After if present, else backoff with jitter."""
+    m = RETRY_AFTER_RE.search(msg)
+    if m:
+        return min(60, int(m.group(1)))
+    return min(60, (2**attempt) * 0.5 + random.random())
+
+
+def available_langs(info):
+    """Subtitle languages (manual or automatic) of a probed video, None if unknown."""
+    if not info or info.get("_type", "video") != "video":
+        return None
+    return set(info.get("subtitles") or {}) | set(info.get("automatic_captions") or {})
+
+
+def subtitle_sleep(value):
+    try:
+        return int(value) if value else 0
+    except Exception:
+        return 0
+
+
+def video_key(url, lang):
+    """Cache key for a request: the video id if it can be parsed, else the raw url."""
+    m = VIDEO_ID_RE.search(url)
+    return (m.group(1) if m else url.strip(), lang)
+
+
+def jresp(obj, code=200):
+    """JSON response serialized with orjson (caption texts can be large)."""
+    return app.response_class(
+        orjson.dumps(obj), status=code, mimetype="application/json"
+    )
+
 
 @app.route("/")
 def index():
-    return render_template("index.html")
+    resp = Response(INDEX_BYTES, mimetype="text/html")
+    resp.set_etag(INDEX_ETAG)
+    resp.cache_control.public = True
+    resp.cache_control.max_age = 3600
+    return resp.make_conditional(request)
+
+
+def fetch_captions(url, lang, sleep_subtitles=None, progress=None):
+    """Download subtitles for `url` with yt-dlp and return (payload, status).
+
+    `lang` is a language code or a list of them; several languages are fetched
+    in parallel from a single probe of the video (one after another when
+    `sleep_subtitles` is set). Unavailable languages of a list are reported in
+    `missing`; the request only fails with 404 when none can be served.
+    `progress`, if given, is called with small dicts describing yt-dlp progress.
+    """
+    langs = lang_list(lang)
+    texts = cached_texts(url, langs)
+    todo = [l for l in langs if l not in texts]
+
+    note = None
+    if todo:
+        # probe first: no download round-trip for missing langs
+        info, note = probe_video(url, progress)
+        available = available_langs(info)
+        missing = [l for l in todo if available is not None and l not in available]
+        none_left = len(missing) == len(todo) and not texts
+        if missing and (isinstance(lang, str) or none_left):
+            error = {
+                "error": f"No subtitles for language '{', '.join(missing)}'",
+                "available": sorted(available),
+            }
+            return error, 404
+        todo = [l for l in todo if l not in missing]
+
+        # subtitles are small: keep the temp dir in RAM when /dev/shm exists
+        with tempfile.TemporaryDirectory(
+            prefix="ytcaps_", dir=SHM_DIR, ignore_cleanup_errors=True
+        ) as tmpdir:
+            if info is not None and todo:
+                sleep = subtitle_sleep(sleep_subtitles)
+
+                def fetch_one(i):
+                    outdir = os.path.join(tmpdir, str(i))
+                    return write_subtitles(info, todo[i], outdir, sleep, progress)
+
+                # each language is I/O-bound: fetch them concurrently, unless a
+                # subtitle sleep was asked for to stay under YouTube's rate limit
+                workers = 1 if sleep else min(LANG_WORKERS, len(todo))
+                with ThreadPoolExecutor(max_workers=workers) as ex:
+                    results = list(ex.map(fetch_one, range(len(todo))))
+                for l, (text, lang_note) in zip(todo, results):
+                    note = note or lang_note
+                    if text is not None:
+                        texts[l] = text
+                        if text:
+                            with CAPTIONS_CACHE_LOCK:
+                                CAPTIONS_CACHE[video_key(url, l)] = text
+
+    if not texts:
+        return (
+            {
+                "error": "No subtitles found",
+                "note": note or "Try --sleep_subtitles or pass fresh cookies",
+            },
+            502,
+        )
+
+    resp = captions_payload(lang, texts)
+    if note:
+        resp["note"] = note
+    return resp, 200
+
+
+def lang_list(lang):
+    """Requested language codes as a list without duplicates."""
+    return [lang] if isinstance(lang, str) else list(dict.fromkeys(lang))
+
+
+def cached_texts(url, langs):
+    """Cached captions of `url` for those of `langs` that have them."""
+    texts = {}
+    with CAPTIONS_CACHE_LOCK:
+        for l in langs:
+            text = CAPTIONS_CACHE.get(video_key(url, l))
+            if text is not None:
+                texts[l] = text
+    return texts
+
+
+def captions_payload(lang, texts):
+    """Success payload: `text` for a single language, `texts` for a list."""
+    if isinstance(lang, str):
+        return {"ok": True, "lang": lang, "text": texts[lang]}
+    langs = lang_list(lang)
+    resp = {"ok": True, "lang": langs, "texts": texts}
+    missing = [l for l in langs if l not in texts]
+    if missing:
+        resp["missing"] = missing
+    return resp
+
+
+def probe_video(url, progress=None):
+    """extract_info without downloading; return (info, note), info None on failure."""
+    with pooled_ydl() as ydl:
+        info, note = with_retries(
+            lambda: ydl.extract_info(url, download=False), progress
+        )
+        # sanitized once here so each language can take its own copy of it later
+        return ydl.sanitize_info(info), note
+
+
+def write_subtitles(info, lang, outdir, sleep, progress=None):
+    """Write the `lang` subtitles of a probed video to `outdir`; return (text, note)."""
+    with pooled_ydl(
+        outtmpl={"default": os.path.join(outdir, "%(id)s.%(ext)s")},
+        subtitleslangs=[lang],
+        sleep_interval_subtitles=sleep,
+    ) as ydl:
+        YDL_LOCAL.progress = progress
+        try:
+            # reuse the probed info instead of extracting again
+            _, note = with_retries(
+                lambda: ydl.process_ie_result(ydl.sanitize_info(info), download=True),
+                progress,
+            )
+        finally:
+            YDL_LOCAL.progress = None
+    # continue to try to find any subtitles written
+    return read_subtitles(outdir), note
+
+
+def read_subtitles(outdir):
+    """Plain text of the best subtitle file in `outdir`, None if there is none."""
+    if not os.path.isdir(outdir):
+        return None
+    # locate downloaded subtitle file: one pass, then pick by priority
+    found = {}
+    for de in os.scandir(outdir):
+        # yt-dlp writes lowercase extensions: only lowercase when that misses
+        ext = de.name.rpartition(".")[2]
+        if ext not in SUB_EXTS:
+            ext = ext.lower()
+        if ext in SUB_EXTS:
+            found.setdefault(ext, de.path)
+    chosen_ext = next((ext for ext in SUB_EXTS if ext in found), None)
+    if chosen_ext is None:
+        return None
+
+    # extract plain text directly, no intermediate file
+    return PLAIN_EXTRACTORS[chosen_ext](found[chosen_ext])
+
+
+def with_retries(fn, progress=None):
+    """Call `fn`, retrying 429s with backoff; return (result, note).
+
+    Other errors are swallowed (result None), as yt-dlp may still have written
+    part of what was asked. If the 429 persists, `note` says so.
+    """
+    for attempt in range(RETRY_ATTEMPTS):
+        try:
+            return fn(), None
+        except Exception as e:
+            # handle known 429 case: back off and retry
+            msg = str(e)
+            if "429" not in msg and "Too Many Requests" not in msg:
+                return None, None
+            if attempt == RETRY_ATTEMPTS - 1:
+                return None, NOTE_429
+            delay = retry_delay(attempt, msg)
+            if progress:
+                progress({"status": "retrying", "wait": round(delay, 1)})
+            time.sleep(delay)
+
+
+def progress_event(d):
+    """Reduce a yt-dlp progress dict to what the UI needs."""
+    event = {"status": d.get("status")}
+    total = d.get("total_bytes") or d.get("total_bytes_estimate")
+    done = d.get("downloaded_bytes")
+    if total and done is not None:
+        event["percent"] = round(100.0 * done / total, 1)
+    return event
+
+
+def run_job(q, url, lang, sleep_subtitles):
+    try:
+        resp, code = fetch_captions(url, lang, sleep_subtitles, progress=q.put)
+    except Exception as e:
+        resp, code = {"error": str(e)}, 500
+    q.put({"status": "done", "code": code, "result": resp})
 
 
 @app.route("/api/captions", methods=["POST"])
 def captions_api():
-    data = request.get_json() or {}
+    raw = request.get_data(cache=False)
+    try:
+        data = orjson.loads(raw) if raw else {}
+    except orjson.JSONDecodeError:
+        return jresp({"error": "Invalid JSON body"}, 400)
+    if not isinstance(data, dict):
+        return jresp({"error": "Invalid JSON body"}, 400)
     url = data.get("url")
     lang = data.get("lang", "es")
     sleep_subtitles = data.get("sleep_subtitles")  # optional int
 
-    if not url:
-        return jsonify({"error": "Missing url parameter"}), 400
+    if not isinstance(url, str) or not url.strip():
+        return jresp({"error": "Missing url parameter"}, 400)
+    langs = [lang] if isinstance(lang, str) else lang
+    if not langs or not isinstance(langs, list):
+        return jresp({"error": "Invalid lang parameter"}, 400)
+    if not all(isinstance(l, str) and l for l in langs):
+        return jresp({"error": "Invalid lang parameter"}, 400)
 
-    tmpdir = tempfile.mkdtemp(prefix="ytcaps_")
-    try:
-        # prepare ydl options
-        outtmpl = os.path.join(tmpdir, "%(id)s.%(ext)s")
-        ydl_opts = {
-            "writesubtitles": True,
-            "writeautomaticsub": True,
-            "subtitleslangs": [lang],
-            "skip_download": True,
-            "outtmpl": outtmpl,
-            "quiet": True,
-            "no_warnings": True,
-            # avoid auto-translated subs where possible
-            "extractor_args": {"youtube": "skip=translated_subs"},
-        }
-        if sleep_subtitles:
-            try:
-                ydl_opts["sleep_subtitles"] = int(sleep_subtitles)
-            except Exception:
-                pass
-
-        # prefer srt if ffmpeg available
-        import shutil as _sh
-
-        if _sh.which("ffmpeg"):
-            ydl_opts["subtitlesformat"] = "srt"
-            ydl_opts["convertsubtitles"] = "srt"
+    texts = cached_texts(url, lang_list(lang))
+    if len(texts) == len(lang_list(lang)):
+        return jresp(captions_payload(lang, texts))
 
-        with YoutubeDL(ydl_opts) as ydl:
-            try:
-                ydl.download([url])
-            except Exception as e:
-                # handle known 429 case
-                msg = str(e)
-                note = None
-                if "429" in msg or "Too Many Requests" in msg:
-                    note = "Warning: YouTube returned 429. Try passing fresh cookies or increasing sleep_subtitles (e.g. 60)."
-                # continue to try to find any subtitles written
-
-        # locate downloaded subtitle file
-        candidates = glob(os.path.join(tmpdir, "*.*"))
-        subfile = None
-        chosen_ext = None
-        for ext in ("srt", "vtt"):
-            for c in candidates:
-                if c.lower().endswith("." + ext):
-                    subfile = c
-                    chosen_ext = ext
-                    break
-            if subfile:
-                break
-
-        if not subfile:
-            return (
-                jsonify(
-                    {
-                        "error": "No subtitles found",
-                        "note": "Try --sleep_subtitles or pass fresh cookies",
-                    }
-                ),
-                502,
-            )
+    # run yt-dlp in the background; the client follows it on /progress/<job_id>
+    job_id = uuid.uuid4().hex
+    q = queue.Queue()
+    with JOBS_LOCK:
+        JOBS[job_id] = q
+    threading.Thread(
+        target=run_job, args=(q, url, lang, sleep_subtitles), daemon=True
+    ).start()
+    return jresp({"job_id": job_id}, 202)
 
-        # read and extract plain text
-        txt_path = os.path.join(tmpdir, "out.txt")
-        if chosen_ext == "srt":
-            extract_plain_from_srt(subfile, txt_path)
-        else:
-            extract_plain_from_vtt(subfile, txt_path)
 
-        with open(txt_path, "r", encoding="utf-8") as fh:
-            text = fh.read()
+@app.route("/progress/<job_id>")
+def progress_stream(job_id):
+    with JOBS_LOCK:
+        q = JOBS.get(job_id)
+    if q is None:
+        return jresp({"error": "Unknown job"}, 404)
 
-        resp = {"ok": True, "lang": lang, "text": text}
-        if "note" in locals() and note:
-            resp["note"] = note
-        return jsonify(resp)
+    def stream():
+        while True:
+            try:
+                event = q.get(timeout=15)
+            except queue.Empty:
+                # keep proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                continue
+            yield b"data: " + orjson.dumps(event) + b"\n\n"
+            if event["status"] == "done":
+                with JOBS_LOCK:
+                    JOBS.pop(job_id, None)
+                return
 
-    finally:
-        shutil.rmtree(tmpdir, ignore_errors=True)
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 if __name__ == "__main__":
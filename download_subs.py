@@ -19,11 +19,33 @@ import sys
 import shutil
 import re
 import html
-from glob import glob
-import srt
+import orjson
 
 DEFAULT_URL = "https://youtu.be/tYqehyG2K38"
 
+# Patrones precompilados para la limpieza de VTT/SRT
+_TAG = re.compile(r"<[^>\n]+>")
+# Cue VTT: línea de tiempos y las líneas de texto hasta la primera línea vacía
+# o la siguiente línea con `-->` (las líneas de sólo espacios forman parte del texto)
+_VTT_CUE = re.compile(r"-->[^\n]*\n((?:(?![^\n]*-->)[^\n]+(?:\n|\Z))*)")
+# Entidades habituales en los VTT de YouTube (resto: html.unescape)
+_ENT = {
+    "&amp;": "&",
+    "&lt;": "<",
+    "&gt;": ">",
+    "&quot;": '"',
+    "&#39;": "'",
+    "&nbsp;": "\xa0",
+}
+_ENT_RE = re.compile("|".join(map(re.escape, _ENT)))
+# Bloque SRT: índice, línea de tiempos y las líneas de texto hasta la línea vacía
+_SRT_CUE = re.compile(
+    r"^\ufeff?\d+[ \t]*\n"
+    r"\d+:\d+:\d+[,.]\d+[ \t]*-->[ \t]*\d+:\d+:\d+[,.]\d+[^\n]*\n"
+    r"((?:[^\n]+(?:\n|\Z))*)",
+    re.M,
+)
+
 # Guardar por defecto en la carpeta del proyecto (donde está este script)
 SCRIPT_DIR = os.path.abspath(os.path.dirname(__file__))
 DEFAULT_OUTDIR = SCRIPT_DIR
@@ -50,59 +72,88 @@ def build_yt_dlp_cmd(url, lang="es", outdir=DEFAULT_OUTDIR, convert=True):
 
 
 def find_subfile(outdir, video_id=None, lang="es", ext="srt"):
-    pattern = os.path.join(outdir, f"*.{ext}")
-    matches = glob(pattern)
-    if not matches:
-        return None
-    if video_id:
-        for m in matches:
-            if video_id in os.path.basename(m):
-                return m
-    # fallback: return newest
-    return sorted(matches, key=os.path.getmtime, reverse=True)[0]
-
-
-def extract_plain_from_srt(srt_path, txt_path):
+    # Una sola pasada: parar en cuanto aparezca el id, si no quedarse con el más reciente
+    suffix = "." + ext
+    newest, newest_mtime = None, -1.0
+    with os.scandir(outdir) as it:
+        for de in it:
+            if not de.name.endswith(suffix) or de.name.startswith("."):
+                continue
+            if video_id and video_id in de.name:
+                return de.path
+            mtime = de.stat(follow_symlinks=False).st_mtime
+            if mtime > newest_mtime:
+                newest, newest_mtime = de.path, mtime
+    return newest
+
+
+def _write_plain(plain, txt_path):
+    if txt_path:
+        with open(txt_path, "w", encoding="utf-8") as out:
+            out.write(plain)
+    return plain
+
+
+def _unescape(text):
+    """html.unescape rápido para las entidades de `_ENT`."""
+    if "&" not in text:
+        return text
+    fast, n = _ENT_RE.subn(lambda m: _ENT[m.group()], text)
+    # Si hay otros `&` (entidades raras), usar el parser completo
+    return fast if n == text.count("&") else html.unescape(text)
+
+
+def extract_plain_from_srt(srt_path, txt_path=None):
+    """Devuelve el texto plano de un SRT (y lo guarda en `txt_path` si se indica)."""
     with open(srt_path, "r", encoding="utf-8") as fh:
         content = fh.read()
-    subs = list(srt.parse(content))
-    plain = "\n".join(s.content.replace("\n", " ") for s in subs)
-    with open(txt_path, "w", encoding="utf-8") as out:
-        out.write(plain)
+    # Sólo interesa el texto: evitar construir objetos Subtitle/timedelta con `srt`
+    plain = "\n".join(
+        c.rstrip("\n").replace("\n", " ") for c in _SRT_CUE.findall(content)
+    )
+    return _write_plain(plain, txt_path)
 
 
-def extract_plain_from_vtt(vtt_path, txt_path):
+def extract_plain_from_vtt(vtt_path, txt_path=None):
     """Extractor robusto de texto desde WebVTT:
+    - toma sólo el texto de cada cue (entre la línea `-->` y la siguiente línea vacía)
     - elimina todas las marcas entre `<` y `>` (timestamps embebidos, etiquetas `<c>`, etc.)
     - unescape de entidades HTML
     - normaliza espacios y deduplica líneas consecutivas
+    Devuelve el texto plano (y lo guarda en `txt_path` si se indica).
     """
-    texts = []
     with open(vtt_path, "r", encoding="utf-8") as fh:
-        for line in fh:
-            line = line.strip()
-            if not line:
-                continue
-            # Saltar cabecera WEBVTT y líneas de timestamps
-            if line.upper().startswith("WEBVTT") or "-->" in line:
-                continue
-            # Omitir índices numéricos
-            if line.isdigit():
-                continue
-            # Eliminar todo lo que esté entre < y > (ej: <00:00:02.840>, <c>..</c>)
-            clean = re.sub(r"<[^>]+>", "", line)
-            # Deshacer entidades HTML si existen
-            clean = html.unescape(clean)
-            # Normalizar espacios
-            clean = re.sub(r"\s+", " ", clean).strip()
-            if not clean:
-                continue
-            # Evitar duplicados consecutivos
-            if len(texts) == 0 or texts[-1] != clean:
-                texts.append(clean)
-    plain = "\n".join(texts)
-    with open(txt_path, "w", encoding="utf-8") as out:
-        out.write(plain)
+        data = fh.read()
+    # Extraer de una vez el texto de todas las cues (se descartan cabecera e índices)
+    joined = "\n".join(_VTT_CUE.findall(data))
+    # Eliminar todo lo que esté entre < y > (ej: <00:00:02.840>, <c>..</c>)
+    joined = _TAG.sub("", joined)
+    # Deshacer entidades HTML si existen
+    joined = _unescape(joined)
+    return _write_plain(_clean_lines(joined), txt_path)
+
+
+def extract_plain_from_json3(json3_path, txt_path=None):
+    """Devuelve el texto plano de unos subtítulos JSON3 de YouTube (y lo guarda
+    en `txt_path` si se indica). El texto ya viene en segmentos `utf8`: no hay
+    etiquetas ni entidades que limpiar.
+    """
+    with open(json3_path, "rb") as fh:
+        data = orjson.loads(fh.read())
+    joined = "\n".join(
+        "".join(seg.get("utf8", "") for seg in ev["segs"])
+        for ev in data.get("events", ())
+        if "segs" in ev
+    )
+    return _write_plain(_clean_lines(joined), txt_path)
+
+
+def _clean_lines(text):
+    # Normalizar espacios (split/join en C) y descartar líneas vacías
+    lines = [c for c in (" ".join(l.split()) for l in text.split("\n")) if c]
+    # Evitar duplicados consecutivos (comparar con la línea anterior)
+    texts = [c for prev, c in zip([None] + lines, lines) if c != prev]
+    return "\n".join(texts)
 
 
 def main():
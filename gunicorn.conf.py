@@ -0,0 +1,15 @@
+"""gunicorn settings: `gunicorn wsgi:app` picks this file up automatically.
+
+yt-dlp spends nearly all its time waiting on the network, so one gevent worker
+can serve many concurrent requests and /progress streams. Keep a single worker:
+background jobs and the captions cache live in that process's memory, and
+/progress/<job_id> must reach the worker that created the job.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+worker_class = "gevent"
+workers = 1
+worker_connections = 1000
+# SSE responses stay open for the whole yt-dlp run
+timeout = 120